@@ -2,19 +2,32 @@ from flask import Blueprint, request, jsonify
 import os
 import tempfile
 import uuid
-import PyPDF2
+import hashlib
+import shutil
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import pypdfium2 as pdfium
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from nltk.tokenize import word_tokenize
 import spacy
-from sklearn.metrics.pairwise import cosine_similarity
+from spacy.matcher import Matcher
+from spacy.util import filter_spans
 import numpy as np
 import io
 import pandas as pd
 import json
 
+# Below this many resumes the host-to-device copy costs more than the GEMV saves
+GPU_MIN_BATCH = 32
+
+# Minimum cosine similarity for a differently-worded resume skill to count as
+# covering a JD skill
+SKILL_MATCH_THRESHOLD = 0.75
+
+# Bump when the layout of the cached .npz feature files changes
+FEATURE_CACHE_VERSION = 1
+
 # Initialize blueprint
 analyzer_bp = Blueprint('analyzer', __name__)
 
@@ -23,101 +36,314 @@ UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'resume_uploads')
 ALLOWED_EXTENSIONS = {'pdf'}
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# NLP resources initialization
+# Extracted text is cached on disk keyed by the PDF's content hash, so a
+# resume analyzed against several job descriptions is only parsed once
+TEXT_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'text_cache')
+os.makedirs(TEXT_CACHE_FOLDER, exist_ok=True)
+
+# Compiled once; preprocess runs this on every resume
+_NONWORD = re.compile(r'\W+')
+
+# NLP resources initialization. The model is loaded lazily on the first
+# analyze call rather than at import, so worker startup and the endpoints
+# that never touch NLP (upload, submit-job-description) stay fast.
 nlp = None
-stop_words = None
-lem = None
+_skill_matcher = None
+_nlp_lock = threading.Lock()
+
+# Process pool for PDF text extraction, created on first use. Where the
+# platform supports it, workers are forked so they share the parent's memory
+# pages; elsewhere (Windows) the default spawn context is used, which is cheap
+# because the model load is lazy and extraction never touches NLP state.
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                if 'fork' in multiprocessing.get_all_start_methods():
+                    mp_context = multiprocessing.get_context('fork')
+                else:
+                    mp_context = None
+                _pdf_pool = ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    mp_context=mp_context
+                )
+    return _pdf_pool
 
 def load_nlp_resources():
-    """Downloads NLTK data and loads spaCy model."""
-    global nlp, stop_words, lem
-    
+    """Loads the spaCy model on first use; safe to call from concurrent requests."""
+    global nlp, _skill_matcher
+
     # Only load if not already loaded
-    if nlp is not None and stop_words is not None and lem is not None:
+    if nlp is not None:
         return
-    
-    # NLTK downloads - using direct download instead of find/lookup
-    nltk.download('wordnet')
-    nltk.download('stopwords')
-    nltk.download('punkt')
-    
-    # spaCy model download/load
-    NLP_MODEL = "en_core_web_lg"
-    try:
-        nlp = spacy.load(NLP_MODEL)
-    except OSError:
-        print(f"Downloading spaCy model: {NLP_MODEL}")
-        print(f"Downloading required NLP model ({NLP_MODEL})... This may take a few minutes.")
-        spacy.cli.download(NLP_MODEL)
-        nlp = spacy.load(NLP_MODEL)
-        print(f"NLP model ({NLP_MODEL}) downloaded and loaded successfully.")
-    
-    stop_words = set(stopwords.words("english"))
-    lem = WordNetLemmatizer()
 
-# Load NLP resources when the module is imported
-load_nlp_resources()
+    with _nlp_lock:
+        if nlp is not None:
+            return
+
+        # spaCy model download/load. The md model ships the same 300-dim vectors
+        # as lg with a far smaller vocabulary table, cutting load time and RAM.
+        # Only the tagger path is needed (vectors + POS patterns for skills),
+        # so the parser, NER and lemmatizer are excluded entirely.
+        # Set SPACY_MODEL to override the model name.
+        NLP_MODEL = os.environ.get("SPACY_MODEL", "en_core_web_md")
+        EXCLUDED_PIPES = ['parser', 'ner', 'lemmatizer']
+        try:
+            nlp = spacy.load(NLP_MODEL, exclude=EXCLUDED_PIPES)
+        except OSError:
+            print(f"Downloading spaCy model: {NLP_MODEL}")
+            print(f"Downloading required NLP model ({NLP_MODEL})... This may take a few minutes.")
+            spacy.cli.download(NLP_MODEL)
+            nlp = spacy.load(NLP_MODEL, exclude=EXCLUDED_PIPES)
+            print(f"NLP model ({NLP_MODEL}) downloaded and loaded successfully.")
+
+        # Adjective-noun POS patterns stand in for noun_chunks, which would
+        # need the dependency parser - the slowest pipeline component
+        _skill_matcher = Matcher(nlp.vocab)
+        _skill_matcher.add('SKILL', [[
+            {'POS': 'ADJ', 'OP': '*'},
+            {'POS': {'IN': ['NOUN', 'PROPN']}, 'OP': '+'}
+        ]])
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _save_upload(file, filepath):
+    """Saves an uploaded file to filepath.
+
+    On Linux the bytes go into an unnamed O_TMPFILE that is linked into place
+    only once fully written, so a crashed or aborted upload can never leave a
+    partial PDF behind. Elsewhere this falls back to Werkzeug's file.save.
+    """
+    try:
+        fd = os.open(UPLOAD_FOLDER, os.O_TMPFILE | os.O_WRONLY, 0o600)
+    except (AttributeError, OSError):
+        file.save(filepath)
+        return
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            # 1MB chunks keep the syscall count low for 16MB uploads
+            shutil.copyfileobj(file.stream, out, length=1 << 20)
+            out.flush()
+            os.link(f"/proc/self/fd/{out.fileno()}", filepath)
+    except OSError:
+        file.stream.seek(0)
+        file.save(filepath)
+
 def extract_text_from_pdf(file_path):
-    """Extracts text from a PDF file."""
-    text = ""
+    """Extracts text from a PDF file using PDFium, with a content-hash disk cache."""
+    try:
+        with open(file_path, 'rb') as f:
+            pdf_bytes = f.read()
+    except OSError as e:
+        print(f"Error reading PDF file: {e}")
+        return None
+
+    cache_path = os.path.join(TEXT_CACHE_FOLDER, hashlib.blake2b(pdf_bytes).hexdigest() + '.txt')
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            return f.read() or None
+    except FileNotFoundError:
+        pass
+
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            # Stream page by page, releasing each PDFium page handle as soon
+            # as its text is out instead of letting them pile up until GC;
+            # empty pages (scans, dividers) are skipped rather than joined in
+            parts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                try:
+                    page_text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
                 if page_text:
-                    text += page_text + "\n"
+                    parts.append(page_text)
+            text = "\n".join(parts)
+        finally:
+            # Release the underlying PDFium document rather than waiting on GC
+            pdf.close()
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
-        return None
-    
+        # Fall through with an empty sentinel: the bytes are fixed, so a PDF
+        # that raises now will raise on every future parse too
+        text = ""
+
+    # Write-then-rename keeps concurrent readers from seeing partial text;
+    # empty and failed extractions are cached too so broken PDFs aren't
+    # re-parsed
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Error caching extracted text: {e}")
+
     if not text:
         return None
     return text
 
 def preprocess(text):
-    """Cleans and preprocesses text using NLTK."""
+    """Normalizes raw text ahead of the single spaCy pass.
+
+    Only lowercasing and non-word stripping happen here; tokenization,
+    stopword filtering, vectors and noun chunks all come out of the one
+    nlp() parse downstream, so no text is tokenized twice.
+    """
     if not text:
         return ""
-    text = re.sub(r'\W+', ' ', text.lower())
-    tokens = word_tokenize(text)
-    processed_tokens = [lem.lemmatize(t) for t in tokens if t not in stop_words and len(t) > 1]
-    return ' '.join(processed_tokens)
-
-def calculate_similarity(jd_text, resume_text):
-    """Calculates cosine similarity between JD and resume using spaCy vectors."""
-    if not jd_text or not resume_text:
-        return 0.0
-    jd_doc = nlp(jd_text)
-    resume_doc = nlp(resume_text)
-    if not jd_doc.has_vector or not resume_doc.has_vector or not jd_doc.vector_norm or not resume_doc.vector_norm:
-        return 0.0
-    similarity = cosine_similarity([jd_doc.vector], [resume_doc.vector])[0][0]
-    return max(0.0, min(1.0, similarity)) * 100
-
-def extract_skills(text):
-    """Extracts potential skills (noun chunks) from text using spaCy."""
-    if not text:
+    return _NONWORD.sub(' ', text.lower()).strip()
+
+def _content_vector(doc):
+    """Mean vector over content tokens, skipping stopwords and punctuation.
+
+    Matches the old behavior of vectorizing the stopword-stripped text, but
+    derived from the same parse that feeds skill extraction.
+    """
+    vectors = [tok.vector for tok in doc if not tok.is_stop and not tok.is_punct and tok.has_vector]
+    if not vectors:
+        return np.zeros(nlp.vocab.vectors_length, dtype=np.float32)
+    return np.mean(vectors, axis=0)
+
+@lru_cache(maxsize=512)
+def get_doc(text):
+    """Parses text with spaCy, caching Docs so repeated texts are parsed once."""
+    return nlp(text)
+
+@lru_cache(maxsize=1)
+def _get_torch():
+    """Returns torch if installed, else None.
+
+    torch is optional and its import costs seconds and hundreds of MB, so it
+    is deferred to the first large similarity batch rather than paid at
+    blueprint import like the rest of the lazy NLP state.
+    """
+    try:
+        import torch
+        return torch
+    except ImportError:
+        return None
+
+def _normalize_vector_f16(vec):
+    """L2-normalizes a vector and quantizes it to float16 for caching."""
+    norm = np.linalg.norm(vec)
+    if not norm:
+        return np.zeros(vec.shape, dtype=np.float16)
+    return (vec / norm).astype(np.float16)
+
+def calculate_similarity(jd_vec, resume_vectors):
+    """Calculates cosine similarity between the JD vector and pre-normalized resume vectors.
+
+    Returns an array of match scores (0-100), one per resume, computed as a
+    single matrix-vector product instead of N separate dot products. The
+    float16 vectors are upcast to float32 for the BLAS call.
+    """
+    if not resume_vectors:
+        return np.empty(0, dtype=np.float32)
+    jd_norm = float(np.linalg.norm(jd_vec)) if jd_vec is not None else 0.0
+    if not jd_norm:
+        return np.zeros(len(resume_vectors), dtype=np.float32)
+    resume_mat = np.stack(resume_vectors).astype(np.float32)
+    jd_unit = np.ascontiguousarray(jd_vec.astype(np.float32, copy=False) / jd_norm)
+    torch = _get_torch() if len(resume_vectors) >= GPU_MIN_BATCH else None
+    if torch is not None and torch.cuda.is_available():
+        with torch.inference_mode():
+            resume_t = torch.from_numpy(resume_mat).pin_memory().to('cuda', non_blocking=True)
+            jd_t = torch.from_numpy(jd_unit).to('cuda')
+            scores = (resume_t @ jd_t).cpu().numpy()
+    else:
+        scores = resume_mat @ jd_unit
+    return np.clip(scores, 0.0, 1.0) * 100
+
+def extract_skills_from_doc(doc):
+    """Extracts potential skills (adjective-noun phrases) from a tagged Doc."""
+    if doc is None:
         return set()
-    doc = nlp(text)
-    skills = {chunk.text.lower() for chunk in doc.noun_chunks if len(chunk.text.split()) <= 3}
-    skills = {s for s in skills if len(s) > 2 and not all(token in stop_words for token in s.split())}
-    return skills
-
-def analyze_skills(jd_processed, resume_processed):
-    """Performs skill gap analysis."""
-    jd_skills = extract_skills(jd_processed)
-    resume_skills = extract_skills(resume_processed)
+    # filter_spans keeps the longest non-overlapping matches, mirroring the
+    # non-overlapping chunks the dependency parser used to produce; is_stop
+    # is a cached lexeme flag, so no re-splitting or set lookups are needed
+    chunks = filter_spans(_skill_matcher(doc, as_spans=True))
+    return {
+        chunk.text.lower()
+        for chunk in chunks
+        if len(chunk) <= 3 and len(chunk.text) > 2 and any(not tok.is_stop for tok in chunk)
+    }
+
+def _resume_features_path(processed_text):
+    # The loaded model and cache version are part of the key: vectors and
+    # tagger output from one model must never be served after SPACY_MODEL
+    # switches to another, and the files persist in the temp dir
+    model_name = f"{nlp.meta['lang']}_{nlp.meta['name']}-{nlp.meta['version']}"
+    key = f"{model_name}:v{FEATURE_CACHE_VERSION}:{processed_text}"
+    return os.path.join(TEXT_CACHE_FOLDER, hashlib.blake2b(key.encode()).hexdigest() + '.npz')
+
+def _load_resume_features(processed_text):
+    """Loads a cached (normalized float16 vector, skills set) pair, or None."""
+    try:
+        with np.load(_resume_features_path(processed_text), allow_pickle=False) as data:
+            return data['vector'], set(data['skills'].tolist())
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _save_resume_features(processed_text, vector, skills):
+    """Caches a resume's derived features, written atomically like the text cache."""
+    cache_path = _resume_features_path(processed_text)
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, vector=vector, skills=np.array(sorted(skills)))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Error caching resume features: {e}")
+
+def _skill_vectors(skills):
+    """Builds a unit-norm vector per skill phrase from the vocab's word vectors.
+
+    Goes straight to Vocab.vectors, so no pipeline pass is needed; phrases
+    whose words are all out-of-vocabulary get a zero row and never match.
+    """
+    vocab = nlp.vocab
+    mat = np.zeros((len(skills), vocab.vectors_length), dtype=np.float32)
+    for i, skill in enumerate(skills):
+        vectors = [vocab.get_vector(w) for w in skill.split() if vocab.has_vector(w)]
+        if vectors:
+            vec = np.mean(vectors, axis=0)
+            norm = np.linalg.norm(vec)
+            if norm:
+                mat[i] = vec / norm
+    return mat
+
+def analyze_skills(jd_skills, resume_skills):
+    """Performs skill gap analysis against pre-extracted JD skills."""
     if not jd_skills:
         return [], [], "Could not extract skills from Job Description."
-    
+
     strengths = list(jd_skills.intersection(resume_skills))
     missing_skills = list(jd_skills.difference(resume_skills))
-    
+
+    # Semantic pass: a JD skill the resume words differently still counts.
+    # All pairs are scored in one cosine GEMM over the normalized phrase
+    # vectors - at the few hundred skills a request can produce, that is
+    # cheaper than building an approximate-NN index per call.
+    extra_resume_skills = list(resume_skills.difference(jd_skills))
+    if missing_skills and extra_resume_skills:
+        best_match = (_skill_vectors(missing_skills) @ _skill_vectors(extra_resume_skills).T).max(axis=1)
+        still_missing = []
+        for skill, score in zip(missing_skills, best_match):
+            if score >= SKILL_MATCH_THRESHOLD:
+                strengths.append(skill)
+            else:
+                still_missing.append(skill)
+        missing_skills = still_missing
+
     feedback = f"Candidate shows strength in {len(strengths)} key areas. "
     if missing_skills:
         feedback += f"Potential gaps identified in {len(missing_skills)} areas like: {', '.join(missing_skills[:3])}..."
@@ -163,7 +389,7 @@ def upload_resumes():
             unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
             
             filepath = os.path.join(UPLOAD_FOLDER, unique_filename)
-            file.save(filepath)
+            _save_upload(file, filepath)
             
             uploaded_files.append({
                 'original_name': original_filename,
@@ -256,7 +482,10 @@ def analyze_resumes():
     
     job_description_raw = data['job_description']
     resume_files = data['resume_files']
-    
+
+    # First analysis on this worker pays the model load; later ones skip it
+    load_nlp_resources()
+
     # Preprocess job description
     jd_processed = preprocess(job_description_raw)
     if not jd_processed:
@@ -265,19 +494,31 @@ def analyze_resumes():
             'message': 'Could not process the job description'
         }), 400
     
+    # Parse the job description once; its vector and skills come from the same Doc
+    jd_doc = get_doc(jd_processed)
+    jd_skills = extract_skills_from_doc(jd_doc)
+    jd_vec = _content_vector(jd_doc)
+
     results_list = []
     valid_resumes_count = 0
-    
-    # Process each resume
-    for resume_file in resume_files:
-        if 'path' not in resume_file:
-            continue
-        
+
+    # First pass: extract and preprocess each resume, queueing the texts that
+    # survive for a single batched spaCy pass. PDF extraction is fanned out
+    # across the process pool; results are consumed in submission order so the
+    # response keeps the input ordering. This split - pool for the GIL-bound
+    # PDF work, one batched spaCy pass here - beats parallelizing the whole
+    # loop with worker processes, which would load a copy of the model per
+    # worker and serialize Docs back over pipes.
+    entries = [rf for rf in resume_files if 'path' in rf]
+    extract_futures = [_get_pdf_pool().submit(extract_text_from_pdf, rf['path']) for rf in entries]
+
+    pending = []  # (index into results_list, processed text)
+    for resume_file, extract_future in zip(entries, extract_futures):
         file_path = resume_file['path']
         original_name = resume_file.get('original_name', os.path.basename(file_path))
-        
+
         # Extract text from PDF
-        resume_text_raw = extract_text_from_pdf(file_path)
+        resume_text_raw = extract_future.result()
         if not resume_text_raw:
             results_list.append({
                 'resume': original_name,
@@ -285,7 +526,7 @@ def analyze_resumes():
                 'message': 'Could not extract text from PDF'
             })
             continue
-        
+
         # Preprocess resume text
         resume_text_processed = preprocess(resume_text_raw)
         if not resume_text_processed:
@@ -295,23 +536,41 @@ def analyze_resumes():
                 'message': 'Could not preprocess resume text'
             })
             continue
-        
-        # Calculate similarity score
-        match_score = calculate_similarity(jd_processed, resume_text_processed)
-        
-        # Analyze skills
-        strengths, missing, feedback = analyze_skills(jd_processed, resume_text_processed)
-        
-        # Add to results
+
+        pending.append((len(results_list), resume_text_processed))
         results_list.append({
             'resume': original_name,
-            'status': 'success',
-            'match_score': round(match_score, 1),
+            'status': 'success'
+        })
+
+    # Second pass: resolve each resume's vector and skills from the feature
+    # cache where possible; only uncached texts go through the batched spaCy
+    # parse (tagger-only pipeline - parser, NER and lemmatizer are excluded
+    # at load time)
+    features = [_load_resume_features(text) for _, text in pending]
+    uncached = [i for i, cached in enumerate(features) if cached is None]
+    parsed_docs = nlp.pipe((pending[i][1] for i in uncached), batch_size=32)
+    for i, resume_doc in zip(uncached, parsed_docs):
+        vector = _normalize_vector_f16(_content_vector(resume_doc))
+        skills = extract_skills_from_doc(resume_doc)
+        features[i] = (vector, skills)
+        _save_resume_features(pending[i][1], vector, skills)
+
+    # All similarity scores in one BLAS call
+    match_scores = calculate_similarity(jd_vec, [vector for vector, _ in features])
+
+    for (result_index, _), (_, resume_skills), match_score in zip(pending, features, match_scores):
+        # Analyze skills
+        strengths, missing, feedback = analyze_skills(jd_skills, resume_skills)
+
+        # Add to results
+        results_list[result_index].update({
+            'match_score': round(float(match_score), 1),
             'key_strengths': strengths,
             'missing_skills': missing,
             'feedback': feedback
         })
-        
+
         valid_resumes_count += 1
     
     if valid_resumes_count == 0: